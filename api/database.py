@@ -5,11 +5,57 @@ Wraps myrientDL's database functionality for the API.
 """
 
 import os
-from typing import List, Optional, Dict, Any
+import time
+from collections import OrderedDict
+from typing import AsyncIterator, List, Optional, Dict, Any, Tuple
 from pathlib import Path
 from myrientDL.database import Database
 from myrientDL.config import MyrientConfig
-from myrientDL.models import GameFile
+from myrientDL.models import GameFile, Collection, DownloadStatus, FileFormat
+from .models import GameFileResponse
+
+
+# Catalog lookups (consoles, collections) only change when a crawl completes,
+# so their results are kept for CACHE_TTL seconds or until invalidate_cache().
+# Stats also move while downloads run, so they use the shorter STATS_TTL.
+CACHE_TTL = 60.0
+STATS_TTL = 5.0
+_cache: Dict[str, Tuple[float, Any]] = {}
+
+# Recently viewed games, kept in LRU order. Rows carry download progress, so
+# they expire after STATS_TTL like the stats do.
+GAME_CACHE_SIZE = 4096
+_game_cache: "OrderedDict[int, Tuple[float, GameFileResponse]]" = OrderedDict()
+
+
+def _cache_get(key: str, ttl: float = CACHE_TTL) -> Optional[Any]:
+    """Return a cached value if it is still fresh"""
+    entry = _cache.get(key)
+    if entry and time.monotonic() - entry[0] < ttl:
+        return entry[1]
+    return None
+
+
+def _cache_set(key: str, value: Any) -> None:
+    """Store a value in the cache"""
+    _cache[key] = (time.monotonic(), value)
+
+
+def invalidate_cache() -> None:
+    """Drop all cached lookups (call after the catalog or download state changes)"""
+    _cache.clear()
+    _game_cache.clear()
+
+
+# Number of read-only SQLite connections (ignored for PostgreSQL, which pools itself)
+READ_POOL_SIZE = min(4, os.cpu_count() or 1)
+
+
+# Enum member -> string value, so response building is one dict lookup per field
+_COLLECTION_VALUES = {c: c.value for c in Collection}
+_STATUS_VALUES = {s: s.value for s in DownloadStatus}
+_FILE_FORMAT_VALUES = {f: f.value for f in FileFormat}
+_FILE_FORMAT_VALUES[None] = None
 
 
 class DatabaseManager:
@@ -22,18 +68,19 @@ class DatabaseManager:
         else:
             self.db_path = Path(db_path)  # Convert to Path for SQLite
 
-        self.db = Database(self.db_path)
+        # Concurrent API requests read through a pool of read-only connections
+        self.db = Database(self.db_path, read_pool_size=READ_POOL_SIZE)
 
     async def connect(self):
         """Initialize database connection (creates tables if needed)"""
-        # Initialize database tables
+        # Opens the connection that is kept for the app's lifetime and
+        # initializes database tables
         await self.db.init_db()
 
     async def disconnect(self):
         """Close database connection"""
-        # Close PostgreSQL connection pool if exists
-        if hasattr(self.db, '_pool') and self.db._pool:
-            await self.db._pool.close()
+        # Closes the SQLite connections or the PostgreSQL pool
+        await self.db.close()
 
     async def get_games(
         self,
@@ -41,77 +88,115 @@ class DatabaseManager:
         collection: Optional[str] = None,
         limit: int = 100,
         offset: int = 0
-    ) -> List[Dict]:
+    ) -> List[GameFileResponse]:
         """Get games with filters"""
-        # Use correct method name: get_game_files not get_all_games
-        games = await self.db.get_game_files()
-
-        # Filter by console
-        if console:
-            games = [g for g in games if g.console == console]
-
-        # Filter by collection
-        if collection:
-            games = [g for g in games if g.collection.value == collection]
-
-        # Apply pagination
-        games = games[offset:offset + limit]
-
-        # Convert to dicts with extra fields
-        return [self._game_to_dict(g) for g in games]
-
-    async def get_game_by_id(self, game_id: int) -> Optional[Dict]:
+        # Filtering and pagination happen in SQL so only one page is loaded
+        games = await self.db.query_game_files(
+            console=console,
+            collection=collection,
+            limit=limit,
+            offset=offset,
+        )
+
+        # Convert to response models with extra fields
+        return [self._game_to_response(g) for g in games]
+
+    async def iter_games(
+        self,
+        console: Optional[str] = None,
+        collection: Optional[str] = None,
+        limit: int = 100,
+        offset: int = 0
+    ) -> AsyncIterator[GameFileResponse]:
+        """Yield games with filters one at a time (for streaming large pages)"""
+        async for game in self.db.iter_game_files(
+            console=console,
+            collection=collection,
+            limit=limit,
+            offset=offset,
+        ):
+            yield self._game_to_response(game)
+
+    async def get_game_by_id(self, game_id: int) -> Optional[GameFileResponse]:
         """Get game by ID"""
-        # Use correct method name: get_game_file not get_game
-        game = await self.db.get_game_file(game_id)
-        return self._game_to_dict(game) if game else None
+        entry = _game_cache.get(game_id)
+        if entry and time.monotonic() - entry[0] < STATS_TTL:
+            _game_cache.move_to_end(game_id)
+            return entry[1]
+
+        games = await self.db.get_game_files_by_ids([game_id])
+        if not games:
+            return None
+
+        game = self._game_to_response(games[0])
+        _game_cache[game_id] = (time.monotonic(), game)
+        _game_cache.move_to_end(game_id)
+        if len(_game_cache) > GAME_CACHE_SIZE:
+            _game_cache.popitem(last=False)
+        return game
+
+    async def bulk_upsert_games(self, games: List[GameFile]):
+        """Insert or refresh a batch of crawled games in one transaction"""
+        await self.db.upsert_game_files(games)
+        invalidate_cache()
 
     async def get_collections_with_stats(self) -> List[Dict]:
         """Get all collections with game counts"""
-        collections = await self.db.get_collections()
-        result = []
-
-        for collection in collections:
-            games = await self.db.get_games_by_collection(collection)
-            total_size = sum(g.size or 0 for g in games)
-
-            result.append({
-                "name": collection.value,
-                "game_count": len(games),
+        cached = _cache_get("collections")
+        if cached is not None:
+            return cached
+
+        collection_stats = await self.db.get_collection_stats()
+        result = [
+            {
+                "name": name,
+                "game_count": game_count,
                 "total_size": total_size,
                 "update_frequency": "Varies",
                 "content_type": "Games"
-            })
-
+            }
+            for name, game_count, total_size in collection_stats
+        ]
+        _cache_set("collections", result)
         return result
 
     async def get_consoles(self) -> List[str]:
         """Get list of unique consoles"""
+        cached = _cache_get("consoles")
+        if cached is not None:
+            return cached
+
         consoles = await self.db.get_consoles()
+        _cache_set("consoles", consoles)
         return consoles
 
     async def get_stats(self) -> Dict[str, Any]:
         """Get overall statistics"""
-        stats = await self.db.get_stats()
+        cached = _cache_get("stats", STATS_TTL)
+        if cached is not None:
+            return cached
+
+        stats = await self.db.get_summary_stats()
+        _cache_set("stats", stats)
         return stats
 
-    def _game_to_dict(self, game: GameFile) -> Dict:
-        """Convert GameFile to dict for API response"""
-        return {
-            "id": game.id,
-            "url": game.url,
-            "name": game.name,
-            "size": game.size,
-            "console": game.console,
-            "region": game.region,
-            "collection": game.collection.value,
-            "file_format": game.file_format.value if game.file_format else None,
-            "requires_conversion": game.requires_conversion,
-            "status": game.status.value,
-            "bytes_downloaded": game.bytes_downloaded,
-            "download_progress": game.download_progress,
-            "formatted_size": game.formatted_size,
-        }
+    def _game_to_response(self, game: GameFile) -> GameFileResponse:
+        """Convert GameFile to an API response model (values are trusted, so validation is skipped)"""
+        return GameFileResponse.model_construct(
+            id=game.id,
+            url=game.url,
+            name=game.name,
+            size=game.size,
+            console=game.console,
+            region=game.region,
+            collection=_COLLECTION_VALUES[game.collection],
+            file_format=_FILE_FORMAT_VALUES[game.file_format],
+            requires_conversion=game.requires_conversion,
+            status=_STATUS_VALUES[game.status],
+            bytes_downloaded=game.bytes_downloaded,
+            download_progress=game.download_progress,
+            formatted_size=game.formatted_size,
+        )
 
 
 # Dependency for FastAPI
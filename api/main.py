@@ -4,21 +4,22 @@ FastAPI Backend for MyrientDL
 Provides REST API for game archive browsing and downloading.
 """
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Depends
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Request
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List, Optional
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from typing import AsyncIterator, List, Optional
 from pydantic import BaseModel
 from contextlib import asynccontextmanager
 import os
-import traceback
 import logging
+import orjson
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-from database import get_db, DatabaseManager, init_db, close_db
-from models import (
+from .database import get_db, init_db, close_db
+from .models import (
     GameFileResponse,
     CollectionResponse,
     SearchRequest,
@@ -26,12 +27,18 @@ from models import (
     StatsResponse,
     CrawlStatus,
 )
-from services import CrawlService, DownloadService, SearchService
+from .services import CrawlService, DownloadService, SearchService
 
 # Environment variables
 DATABASE_URL = os.getenv("DATABASE_URL")
 MYRIENT_BASE_URL = os.getenv("MYRIENT_BASE_URL", "https://myrient.erista.me")
 
+# Pages larger than this are streamed row by row instead of built in memory
+STREAM_THRESHOLD = 1000
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+# Encoded rows are sent in chunks of about this many bytes rather than one send per row
+STREAM_CHUNK_SIZE = 64 * 1024
+
 
 # Lifespan context manager for startup/shutdown
 @asynccontextmanager
@@ -40,11 +47,11 @@ async def lifespan(app: FastAPI):
     try:
         await init_db()
         logger.info("Database initialized successfully")
-    except Exception as e:
-        logger.error(f"Failed to initialize database: {e}")
-        logger.error(traceback.format_exc())
+    except Exception:
+        logger.exception("Failed to initialize database")
     yield
     # Shutdown
+    await DownloadService.stop_worker()
     await close_db()
 
 
@@ -53,6 +60,7 @@ app = FastAPI(
     description="Backend API for Myrient game archive downloader",
     version="0.1.0",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 # CORS middleware for Next.js frontend
@@ -95,24 +103,22 @@ async def health():
 
 # Collections
 @app.get("/api/collections")
-async def get_collections(db: DatabaseManager = Depends(get_db)):
+async def get_collections():
     """Get all collections with game counts"""
+    db = get_db()
     try:
         collections = await db.get_collections_with_stats()
         return collections
     except Exception as e:
-        logger.error(f"Error in get_collections: {e}")
-        logger.error(traceback.format_exc())
+        logger.exception("Error in get_collections")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 # Search
-@app.post("/api/search")
-async def search_games(
-    request: SearchRequest,
-    db: DatabaseManager = Depends(get_db),
-):
+@app.post("/api/search", response_model=List[GameFileResponse])
+async def search_games(request: SearchRequest):
     """Search for games with fuzzy matching"""
+    db = get_db()
     try:
         search_service = SearchService(db)
         results = await search_service.search(
@@ -123,22 +129,38 @@ async def search_games(
         )
         return results
     except Exception as e:
-        logger.error(f"Error in search_games: {e}")
-        logger.error(traceback.format_exc())
+        logger.exception("Error in search_games")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 # Games
-@app.get("/api/games")
+@app.get("/api/games", response_model=List[GameFileResponse])
 async def list_games(
+    request: Request,
     console: Optional[str] = None,
     collection: Optional[str] = None,
     limit: int = 100,
     offset: int = 0,
-    db: DatabaseManager = Depends(get_db),
 ):
-    """List games with optional filters"""
+    """List games with optional filters
+
+    Clients sending Accept: application/x-ndjson get one JSON object per line,
+    streamed, at any page size (useful for exports).
+    """
+    db = get_db()
     try:
+        wants_ndjson = NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+        if wants_ndjson or limit > STREAM_THRESHOLD:
+            games_iter = db.iter_games(
+                console=console,
+                collection=collection,
+                limit=limit,
+                offset=offset,
+            )
+            if wants_ndjson:
+                return StreamingResponse(_stream_ndjson(games_iter), media_type=NDJSON_MEDIA_TYPE)
+            return StreamingResponse(_stream_json_array(games_iter), media_type="application/json")
+
         games = await db.get_games(
             console=console,
             collection=collection,
@@ -147,14 +169,52 @@ async def list_games(
         )
         return games
     except Exception as e:
-        logger.error(f"Error in list_games: {e}")
-        logger.error(traceback.format_exc())
+        logger.exception("Error in list_games")
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/api/games/{game_id}")
-async def get_game(game_id: int, db: DatabaseManager = Depends(get_db)):
+async def _stream_json_array(games: AsyncIterator[GameFileResponse]) -> AsyncIterator[bytes]:
+    """Encode games as a JSON array, sent in STREAM_CHUNK_SIZE chunks"""
+    try:
+        buffer = bytearray(b"[")
+        first = True
+        async for game in games:
+            if not first:
+                buffer += b","
+            buffer += orjson.dumps(game.model_dump())
+            first = False
+            if len(buffer) >= STREAM_CHUNK_SIZE:
+                yield bytes(buffer)
+                buffer.clear()
+        buffer += b"]"
+        yield bytes(buffer)
+    except Exception:
+        # The response has already started, so the client only sees a truncated body
+        logger.exception("Error streaming games as JSON")
+        raise
+
+
+async def _stream_ndjson(games: AsyncIterator[GameFileResponse]) -> AsyncIterator[bytes]:
+    """Encode games as newline-delimited JSON, sent in STREAM_CHUNK_SIZE chunks"""
+    try:
+        buffer = bytearray()
+        async for game in games:
+            buffer += orjson.dumps(game.model_dump(), option=orjson.OPT_APPEND_NEWLINE)
+            if len(buffer) >= STREAM_CHUNK_SIZE:
+                yield bytes(buffer)
+                buffer.clear()
+        if buffer:
+            yield bytes(buffer)
+    except Exception:
+        # The response has already started, so the client only sees a truncated body
+        logger.exception("Error streaming games as NDJSON")
+        raise
+
+
+@app.get("/api/games/{game_id}", response_model=GameFileResponse)
+async def get_game(game_id: int):
     """Get a specific game by ID"""
+    db = get_db()
     try:
         game = await db.get_game_by_id(game_id)
         if not game:
@@ -163,18 +223,18 @@ async def get_game(game_id: int, db: DatabaseManager = Depends(get_db)):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error in get_game: {e}")
-        logger.error(traceback.format_exc())
+        logger.exception("Error in get_game")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 # Crawl
 @app.post("/api/crawl/start")
-async def start_crawl(
-    background_tasks: BackgroundTasks,
-    db: DatabaseManager = Depends(get_db),
-):
-    """Start crawling Myrient archive (background task)"""
+async def start_crawl(background_tasks: BackgroundTasks, force_refresh: bool = False):
+    """Start crawling Myrient archive (background task)
+
+    Directories crawled in the last week are skipped unless force_refresh is set.
+    """
+    db = get_db()
     try:
         crawl_service = CrawlService(db)
 
@@ -184,38 +244,34 @@ async def start_crawl(
             raise HTTPException(status_code=409, detail="Crawl already in progress")
 
         # Start crawl in background
-        background_tasks.add_task(crawl_service.start_crawl)
+        background_tasks.add_task(crawl_service.start_crawl, force_refresh)
 
         return {"status": "started", "message": "Crawl started in background"}
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error in start_crawl: {e}")
-        logger.error(traceback.format_exc())
+        logger.exception("Error in start_crawl")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/api/crawl/status")
-async def get_crawl_status(db: DatabaseManager = Depends(get_db)):
+async def get_crawl_status():
     """Get current crawl status"""
+    db = get_db()
     try:
         crawl_service = CrawlService(db)
         status = await crawl_service.get_status()
         return status
     except Exception as e:
-        logger.error(f"Error in get_crawl_status: {e}")
-        logger.error(traceback.format_exc())
+        logger.exception("Error in get_crawl_status")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 # Download
 @app.post("/api/download")
-async def queue_download(
-    request: DownloadRequest,
-    background_tasks: BackgroundTasks,
-    db: DatabaseManager = Depends(get_db),
-):
+async def queue_download(request: DownloadRequest):
     """Queue games for download"""
+    db = get_db()
     try:
         download_service = DownloadService(db)
 
@@ -223,8 +279,7 @@ async def queue_download(
         queued = await download_service.queue_downloads(request.game_ids)
 
         # Start download worker in background if not already running
-        if not download_service.is_running():
-            background_tasks.add_task(download_service.start_worker)
+        download_service.ensure_worker()
 
         return {
             "status": "queued",
@@ -232,47 +287,46 @@ async def queue_download(
             "game_ids": queued,
         }
     except Exception as e:
-        logger.error(f"Error in queue_download: {e}")
-        logger.error(traceback.format_exc())
+        logger.exception("Error in queue_download")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/api/download/status")
-async def get_download_status(db: DatabaseManager = Depends(get_db)):
+async def get_download_status():
     """Get download queue status"""
+    db = get_db()
     try:
         download_service = DownloadService(db)
         status = await download_service.get_status()
         return status
     except Exception as e:
-        logger.error(f"Error in get_download_status: {e}")
-        logger.error(traceback.format_exc())
+        logger.exception("Error in get_download_status")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 # Stats
-@app.get("/api/stats")
-async def get_stats(db: DatabaseManager = Depends(get_db)):
+@app.get("/api/stats", response_model=StatsResponse)
+async def get_stats():
     """Get overall statistics"""
+    db = get_db()
     try:
         stats = await db.get_stats()
         return stats
     except Exception as e:
-        logger.error(f"Error in get_stats: {e}")
-        logger.error(traceback.format_exc())
+        logger.exception("Error in get_stats")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 # Consoles
 @app.get("/api/consoles")
-async def get_consoles(db: DatabaseManager = Depends(get_db)):
+async def get_consoles():
     """Get list of all consoles"""
+    db = get_db()
     try:
         consoles = await db.get_consoles()
         return consoles
     except Exception as e:
-        logger.error(f"Error in get_consoles: {e}")
-        logger.error(traceback.format_exc())
+        logger.exception("Error in get_consoles")
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -24,9 +24,6 @@ class GameFileResponse(BaseModel):
     download_progress: float
     formatted_size: str
 
-    class Config:
-        from_attributes = True
-
 
 class CollectionResponse(BaseModel):
     name: str
@@ -7,12 +7,19 @@ Business logic for crawling, downloading, and searching using myrientDL.
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 import asyncio
+import logging
 
-from database import DatabaseManager
+from anyio import Semaphore, create_task_group
+
+from .database import DatabaseManager, invalidate_cache
+from .models import GameFileResponse
 from myrientDL.crawler import MyrientCrawler
 from myrientDL.downloader import DownloadManager
 from myrientDL.search import GameSearch
 from myrientDL.config import MyrientConfig
+from myrientDL.models import GameFile
+
+logger = logging.getLogger(__name__)
 
 
 class CrawlService:
@@ -20,44 +27,86 @@ class CrawlService:
 
     # Class variables to share state across all instances
     _is_running = False
-    _games_found = 0
     _current_url = None
     _last_crawl = None
+    _lock: Optional[asyncio.Lock] = None
+
+    # Number of crawled games written per transaction
+    FLUSH_SIZE = 1000
 
     def __init__(self, db: DatabaseManager):
         self.db = db
 
-    async def start_crawl(self):
-        """Start crawling Myrient"""
-        CrawlService._is_running = True
-        CrawlService._games_found = 0
-        CrawlService._current_url = "https://myrient.erista.me"
-
-        try:
-            # Create config with the database
-            config = MyrientConfig(database_path=self.db.db_path)
-
-            # Create crawler with myrientDL's actual crawler
-            async with MyrientCrawler(config) as crawler:
-                # Crawl from root directory with unlimited depth (it's an async generator)
-                async for game in crawler.crawl_directory("https://myrient.erista.me", max_depth=999):
-                    CrawlService._games_found += 1
-                    # Games are automatically added to the database by the crawler
-
-            CrawlService._last_crawl = datetime.now()
-
-        except Exception as e:
-            import traceback
-            print(f"Crawl error: {e}")
-            print(traceback.format_exc())
-        finally:
-            CrawlService._is_running = False
+    @classmethod
+    def _get_lock(cls) -> asyncio.Lock:
+        """Get the lock serializing crawls (created lazily inside the running loop)"""
+        if cls._lock is None:
+            cls._lock = asyncio.Lock()
+        return cls._lock
+
+    async def start_crawl(self, force_refresh: bool = False):
+        """Start crawling Myrient
+
+        Directories crawled within the last VISITED_TTL are skipped unless
+        force_refresh is set.
+        """
+        lock = self._get_lock()
+        if lock.locked():
+            # Another crawl is already in progress
+            return
+
+        async with lock:
+            CrawlService._is_running = True
+            CrawlService._current_url = "https://myrient.erista.me"
+
+            try:
+                # Create config with the database
+                config = MyrientConfig(database_path=self.db.db_path)
+
+                # Create crawler with myrientDL's actual crawler
+                # Directories crawled recently (by an earlier run) are skipped
+                async with MyrientCrawler(config, database=self.db.db, force_refresh=force_refresh) as crawler:
+                    # Crawl from root directory with unlimited depth (it's an async generator),
+                    # writing discovered games in batches of FLUSH_SIZE
+                    buffer: List[GameFile] = []
+                    try:
+                        async for game in crawler.crawl_directory("https://myrient.erista.me", max_depth=999):
+                            buffer.append(game)
+                            if len(buffer) >= self.FLUSH_SIZE:
+                                await self.db.bulk_upsert_games(buffer)
+                                buffer = []
+                                await crawler.save_visited()
+                    finally:
+                        # Also when the crawl fails or is cancelled, so the
+                        # directories finished so far aren't crawled again
+                        await self.db.bulk_upsert_games(buffer)
+                        await crawler.save_visited()
+
+                CrawlService._last_crawl = datetime.now()
+
+                # Refresh planner statistics for the new catalog. Only after a
+                # completed crawl, and a failure here doesn't fail the crawl
+                try:
+                    await self.db.db.analyze()
+                except Exception:
+                    logger.exception("ANALYZE after crawl failed")
+
+            except Exception as e:
+                import traceback
+                print(f"Crawl error: {e}")
+                print(traceback.format_exc())
+            finally:
+                CrawlService._is_running = False
+                # Crawl may have changed the catalog
+                invalidate_cache()
 
     async def get_status(self) -> Dict[str, Any]:
         """Get current crawl status"""
+        # Counted from the database on demand instead of tracked per game
+        games_found = await self.db.db.count_game_files()
         return {
             "is_running": CrawlService._is_running,
-            "games_found": CrawlService._games_found,
+            "games_found": games_found,
             "last_crawl": CrawlService._last_crawl,
             "current_url": CrawlService._current_url,
             "progress_percentage": 0.0 if CrawlService._is_running else 100.0,
@@ -68,59 +117,115 @@ class DownloadService:
     """Service for managing downloads"""
 
     # Class variables to share state across all instances
-    _is_running = False
-    _queue: List[int] = []
+    _queue: Optional[asyncio.Queue] = None
+    _worker: Optional[asyncio.Task] = None
     _download_manager: Optional[DownloadManager] = None
 
+    # Maximum number of queued ids loaded from the database per query
+    BATCH_SIZE = 64
+
     def __init__(self, db: DatabaseManager):
         self.db = db
 
+    @classmethod
+    def _get_queue(cls) -> asyncio.Queue:
+        """Get the shared download queue (created lazily inside the running loop)"""
+        if cls._queue is None:
+            cls._queue = asyncio.Queue()
+        return cls._queue
+
     async def queue_downloads(self, game_ids: List[int]) -> List[int]:
         """Queue games for download"""
-        # Mark games as pending in database
-        for game_id in game_ids:
-            game = await self.db.db.get_game_file(game_id)
-            if game:
-                await self.db.db.update_game_file(game_id, status="pending")
-
-        DownloadService._queue.extend(game_ids)
-        return game_ids
+        # Mark games as pending in database; only ids that exist are queued
+        queued = await self.db.db.mark_pending(game_ids)
+        invalidate_cache()
+
+        queue = self._get_queue()
+        for game_id in queued:
+            queue.put_nowait(game_id)
+        return queued
+
+    def ensure_worker(self):
+        """Start the download worker task unless it is already running"""
+        if not self.is_running():
+            DownloadService._worker = asyncio.create_task(self.start_worker())
+
+    @classmethod
+    async def stop_worker(cls):
+        """Cancel the download worker (on application shutdown)"""
+        if cls._worker is not None:
+            cls._worker.cancel()
+            try:
+                await cls._worker
+            except asyncio.CancelledError:
+                pass
+            cls._worker = None
 
     async def start_worker(self):
-        """Start download worker (background task)"""
-        DownloadService._is_running = True
+        """Download worker: waits on the queue and downloads games as they arrive"""
+        queue = self._get_queue()
 
         try:
             # Create download manager with default config
             config = MyrientConfig()
-            DownloadService._download_manager = DownloadManager(
-                config=config,
-                database=self.db.db
-            )
-
-            # Process queue
-            while DownloadService._queue:
-                game_id = DownloadService._queue.pop(0)
-                game = await self.db.db.get_game_file(game_id)
-
-                if game:
-                    await DownloadService._download_manager.download_game(game)
+            async with DownloadManager(config=config, database=self.db.db) as manager:
+                DownloadService._download_manager = manager
+
+                # Bound in-flight downloads so the queue is fed to the task
+                # group as slots free up instead of all at once
+                sem = Semaphore(config.concurrency.global_max)
+
+                async with create_task_group() as tg:
+                    while True:
+                        # Sleep until work arrives, then take whatever else is
+                        # already queued so the batch is loaded with one query
+                        batch = [await queue.get()]
+                        while len(batch) < self.BATCH_SIZE and not queue.empty():
+                            batch.append(queue.get_nowait())
+                        try:
+                            games = await self.db.db.get_game_files_by_ids(batch)
+                        except Exception:
+                            # Skip this batch but keep serving the queue
+                            logger.exception("Failed to load queued games %s", batch)
+                            continue
+
+                        for game in games:
+                            await sem.acquire()
+                            tg.start_soon(self._download_one, game, sem)
+
+        except Exception:
+            # Only setup failures get here; ensure_worker starts a new worker
+            logger.exception("Download worker stopped")
+        finally:
+            DownloadService._download_manager = None
 
-        except Exception as e:
-            print(f"Download error: {e}")
+    async def _download_one(self, game: GameFile, sem: Semaphore):
+        """Download a single game and release its worker slot"""
+        try:
+            await DownloadService._download_manager.download_file(game)
+        except Exception:
+            # An error escaping here would cancel the task group and stop
+            # the worker, stranding the rest of the queue
+            logger.exception("Download of %s failed", game.url)
         finally:
-            DownloadService._is_running = False
+            sem.release()
+            invalidate_cache()
 
     def is_running(self) -> bool:
         """Check if download worker is running"""
-        return DownloadService._is_running
+        worker = DownloadService._worker
+        return worker is not None and not worker.done()
 
     async def get_status(self) -> Dict[str, Any]:
         """Get download queue status"""
+        queue = DownloadService._queue
         return {
-            "is_running": DownloadService._is_running,
-            "queue_length": len(DownloadService._queue),
-            "active_downloads": 1 if DownloadService._is_running and DownloadService._queue else 0,
+            "is_running": self.is_running(),
+            "queue_length": queue.qsize() if queue else 0,
+            "active_downloads": (
+                DownloadService._download_manager.download_stats["active_downloads"]
+                if DownloadService._download_manager else 0
+            ),
         }
 
 
@@ -137,18 +242,27 @@ class SearchService:
         console: Optional[str] = None,
         collection: Optional[str] = None,
         limit: int = 50,
-    ) -> List[Dict]:
+    ) -> List[GameFileResponse]:
         """Search for games with fuzzy matching"""
-        # Use myrientDL's actual search
+        # Word-prefix matches come from the full-text index, so only matching
+        # rows are loaded
+        games = await self.db.db.search_games(
+            query,
+            limit=limit,
+            console=console,
+            collection=collection,
+        )
+        if games:
+            return [self.db._game_to_response(g) for g in games]
+
+        # Nothing matches the query's words (e.g. a typo); fall back to fuzzy
+        # matching with myrientDL's search
         results = await self.game_search.search(
             query=query,
             console=console,
+            collection=collection,
             limit=limit
         )
 
-        # Filter by collection if specified
-        if collection:
-            results = [r for r in results if r.game.collection.value == collection]
-
-        # Convert to dicts
-        return [self.db._game_to_dict(r.game) for r in results]
+        # Convert to response models
+        return [self.db._game_to_response(r.game_file) for r in results]
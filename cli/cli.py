@@ -1,6 +1,6 @@
 import asyncio
 import sys
-from typing import Optional, List
+from typing import Optional, List, Set
 from pathlib import Path
 import yaml
 
@@ -20,16 +20,53 @@ from myrientDL.search import GameSearch, SearchResult
 from myrientDL.models import GameFile, DownloadStatus, Collection, CollectionInfo, DownloadWarning
 from myrientDL.verification import TorrentZipVerifier
 
+# libyaml bindings when PyYAML was built with them, pure Python otherwise
+try:
+    from yaml import CSafeLoader as _YamlLoader, CSafeDumper as _YamlDumper
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader, SafeDumper as _YamlDumper
+
+# Rich color for each download status in result tables
+STATUS_COLORS = {
+    DownloadStatus.COMPLETED: "green",
+    DownloadStatus.DOWNLOADING: "blue",
+    DownloadStatus.FAILED: "red",
+    DownloadStatus.PENDING: "white",
+}
+
+# Number of crawled games written per transaction
+CRAWL_BATCH_SIZE = 500
+
 app = typer.Typer(name="myrient-dl", help="A polite, resumable downloader for Myrient game archive")
 console = Console()
 
 
+def _config_cache_path(config_path: Path) -> Path:
+    """Path of the JSON copy of a parsed YAML config (e.g. .myrient-config.json)"""
+    return config_path.with_name(f".{config_path.stem}.json")
+
+
 def load_config(config_path: Optional[Path] = None) -> MyrientConfig:
     """Load configuration from file or use defaults"""
     if config_path and config_path.exists():
+        # Reuse the JSON copy unless the YAML was edited after it was written
+        cache_path = _config_cache_path(config_path)
+        try:
+            if cache_path.stat().st_mtime > config_path.stat().st_mtime:
+                return MyrientConfig.model_validate_json(cache_path.read_bytes())
+        except (OSError, ValueError):
+            pass
+
         with open(config_path, 'r', encoding='utf-8') as f:
-            config_data = yaml.safe_load(f)
-            return MyrientConfig(**config_data)
+            config_data = yaml.load(f, Loader=_YamlLoader)
+        config = MyrientConfig.model_validate(config_data)
+
+        try:
+            cache_path.write_text(config.model_dump_json(), encoding='utf-8')
+        except OSError:
+            # Read-only config directory; parse the YAML again next time
+            pass
+        return config
     return MyrientConfig()
 
 
@@ -39,8 +76,10 @@ def save_config(config: MyrientConfig, config_path: Path):
     config_dict['download_root'] = str(config_dict['download_root'])
     config_dict['database_path'] = str(config_dict['database_path'])
     
+    # The JSON copy is regenerated from the new YAML on the next load
+    _config_cache_path(config_path).unlink(missing_ok=True)
     with open(config_path, 'w', encoding='utf-8') as f:
-        yaml.dump(config_dict, f, default_flow_style=False, indent=2)
+        yaml.dump(config_dict, f, Dumper=_YamlDumper, default_flow_style=False, indent=2)
 
 
 @app.command()
@@ -119,12 +158,10 @@ async def search_command(
                     console.print(f"Available collections: {', '.join(c.value for c in Collection)}")
                     return
 
-        # Use direct database search which works better
-        db_results = await db.search_games(query, limit)
-
-        # Filter by collection if specified
-        if collection_enum:
-            db_results = [g for g in db_results if g.collection == collection_enum]
+        # Use direct database search which works better (filters are applied in SQL)
+        db_results = await db.search_games(
+            query, limit, console=console_filter, collection=collection_enum
+        )
 
         # Convert to SearchResult format
         from .search import SearchResult
@@ -158,12 +195,7 @@ async def search_command(
         for i, result in enumerate(results, 1):
             game = result.game_file
             size_mb = f"{game.size_mb:.1f} MB" if game.size else "Unknown"
-            status_color = {
-                DownloadStatus.COMPLETED: "green",
-                DownloadStatus.DOWNLOADING: "blue",
-                DownloadStatus.FAILED: "red",
-                DownloadStatus.PENDING: "white"
-            }.get(game.status, "white")
+            status_color = STATUS_COLORS.get(game.status, "white")
             
             table.add_row(
                 str(i),
@@ -199,20 +231,20 @@ async def search_command(
 
 def parse_selection(selection_str: str, max_index: int) -> List[int]:
     """Parse selection string like '1,3,5-7' into list of indices"""
-    indices = []
+    indices: Set[int] = set()
     parts = selection_str.split(',')
     
     for part in parts:
         part = part.strip()
         if '-' in part:
             start, end = map(int, part.split('-'))
-            indices.extend(range(start, min(end + 1, max_index + 1)))
+            indices.update(range(start, min(end + 1, max_index + 1)))
         else:
             idx = int(part)
             if 1 <= idx <= max_index:
-                indices.append(idx)
+                indices.add(idx)
     
-    return sorted(set(indices))
+    return sorted(indices)
 
 
 @app.command()
@@ -220,13 +252,20 @@ def crawl(
     url: Optional[str] = typer.Option(None, help="Specific URL to crawl (default: full Myrient archive)"),
     max_depth: int = typer.Option(3, "--depth", "-d", help="Maximum crawl depth"),
     config_path: Optional[Path] = typer.Option(None, "--config", help="Configuration file path"),
-    update: bool = typer.Option(False, "--update", "-u", help="Update existing entries")
+    update: bool = typer.Option(False, "--update", "-u", help="Update existing entries"),
+    force_refresh: bool = typer.Option(False, "--force-refresh", help="Re-crawl directories crawled in the last week")
 ):
     """Crawl Myrient archive to discover games"""
-    asyncio.run(crawl_command(url, max_depth, config_path, update))
+    asyncio.run(crawl_command(url, max_depth, config_path, update, force_refresh))
 
 
-async def crawl_command(url: Optional[str], max_depth: int, config_path: Optional[Path], update: bool):
+async def crawl_command(
+    url: Optional[str],
+    max_depth: int,
+    config_path: Optional[Path],
+    update: bool,
+    force_refresh: bool
+):
     config = load_config(config_path)
     crawl_url = url or config.base_url
     
@@ -236,7 +275,7 @@ async def crawl_command(url: Optional[str], max_depth: int, config_path: Optiona
         console.print(f"[blue]Starting crawl of {crawl_url}[/blue]")
         
         discovered_count = 0
-        added_count = 0
+        initial_count = await db.count_game_files()
         
         with Progress(
             TextColumn("[progress.description]{task.description}"),
@@ -247,18 +286,29 @@ async def crawl_command(url: Optional[str], max_depth: int, config_path: Optiona
         ) as progress:
             task = progress.add_task("Crawling...", total=None)
             
-            async with MyrientCrawler(config) as crawler:
-                async for game_file in crawler.crawl_directory(crawl_url, max_depth):
-                    discovered_count += 1
-                    progress.update(task, completed=discovered_count)
-                    
-                    # Add to database
-                    was_added = await db.add_game_file(game_file)
-                    if was_added:
-                        added_count += 1
-                    elif update:
-                        await db.update_game_file(game_file)
+            # Add to database in batches; with --update, catalog fields of
+            # existing entries are refreshed (download state is kept)
+            write_batch = db.upsert_game_files if update else db.add_game_files
+            
+            async with MyrientCrawler(config, database=db, force_refresh=force_refresh) as crawler:
+                batch: List[GameFile] = []
+                try:
+                    async for game_file in crawler.crawl_directory(crawl_url, max_depth):
+                        discovered_count += 1
+                        progress.update(task, completed=discovered_count)
+                        
+                        batch.append(game_file)
+                        if len(batch) >= CRAWL_BATCH_SIZE:
+                            await write_batch(batch)
+                            batch = []
+                            await crawler.save_visited()
+                finally:
+                    # Also on Ctrl-C, so the directories finished so far
+                    # don't have to be crawled again
+                    await write_batch(batch)
+                    await crawler.save_visited()
         
+        added_count = await db.count_game_files() - initial_count
         console.print(f"[green]Crawl complete![/green]")
         console.print(f"Discovered: {discovered_count} games")
         console.print(f"Added to database: {added_count} new games")
@@ -328,7 +378,10 @@ async def download_games(games: List[GameFile], config: MyrientConfig):
     
     async with Database(config.database_path) as db:
         async with DownloadManager(config, db) as manager:
+            # One aggregate bar plus a bar per download in flight; bars for
+            # queued games would make every refresh redraw the whole batch
             progress_data = {}
+            last_downloaded = {game.url: game.bytes_downloaded for game in games}
             
             with Progress(
                 TextColumn("[progress.description]{task.description}"),
@@ -339,22 +392,36 @@ async def download_games(games: List[GameFile], config: MyrientConfig):
                 TimeRemainingColumn()
             ) as progress:
                 
-                # Create progress tasks for each game
-                for game in games:
-                    task_id = progress.add_task(
-                        game.name[:30] + "..." if len(game.name) > 30 else game.name,
-                        total=game.size or 100,
-                        completed=game.bytes_downloaded
-                    )
-                    progress_data[game.url] = task_id
+                overall = progress.add_task(
+                    f"All {len(games)} games",
+                    total=total_size or None,
+                    completed=sum(last_downloaded.values())
+                )
                 
                 # Add progress callback
                 def update_progress(game_file: GameFile, downloaded: int, total: int):
-                    if game_file.url in progress_data:
-                        task_id = progress_data[game_file.url]
-                        # Use the total from the callback if available, otherwise keep the original game size
-                        actual_total = total or game_file.size or 100
-                        progress.update(task_id, completed=downloaded, total=actual_total)
+                    if game_file.url not in last_downloaded:
+                        return
+                    progress.update(overall, advance=downloaded - last_downloaded[game_file.url])
+                    last_downloaded[game_file.url] = downloaded
+                    
+                    # Use the total from the callback if available, otherwise keep the original game size
+                    actual_total = total or game_file.size or 100
+                    if downloaded >= actual_total:
+                        # Finished; drop its bar
+                        task_id = progress_data.pop(game_file.url, None)
+                        if task_id is not None:
+                            progress.remove_task(task_id)
+                        return
+                    
+                    task_id = progress_data.get(game_file.url)
+                    if task_id is None:
+                        name = game_file.name
+                        task_id = progress_data[game_file.url] = progress.add_task(
+                            name[:30] + "..." if len(name) > 30 else name,
+                            total=actual_total
+                        )
+                    progress.update(task_id, completed=downloaded, total=actual_total)
                 
                 manager.add_progress_callback(update_progress)
                 
@@ -484,12 +551,7 @@ async def list_games_command(
         
         for game in games:
             size_str = f"{game.size_mb:.1f} MB" if game.size else "Unknown"
-            status_color = {
-                DownloadStatus.COMPLETED: "green",
-                DownloadStatus.DOWNLOADING: "blue", 
-                DownloadStatus.FAILED: "red",
-                DownloadStatus.PENDING: "white"
-            }.get(game.status, "white")
+            status_color = STATUS_COLORS.get(game.status, "white")
             
             table.add_row(
                 game.name[:60] + "..." if len(game.name) > 60 else game.name,
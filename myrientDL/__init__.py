@@ -19,10 +19,29 @@ from .models import (
     DownloadWarning,
 )
 from .database import Database
-from .crawler import MyrientCrawler
-from .downloader import DownloadManager
-from .search import GameSearch, SearchResult
-from .verification import TorrentZipVerifier, ChecksumVerifier
+
+# The crawler, downloader, search and verification modules pull in httpx,
+# selectolax, fuzzywuzzy, etc. They are imported on first attribute access
+# (PEP 562), so importing the package for models/database alone stays cheap.
+_LAZY_IMPORTS = {
+    "MyrientCrawler": ".crawler",
+    "DownloadManager": ".downloader",
+    "GameSearch": ".search",
+    "SearchResult": ".search",
+    "TorrentZipVerifier": ".verification",
+    "ChecksumVerifier": ".verification",
+}
+
+
+def __getattr__(name):
+    module = _LAZY_IMPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    from importlib import import_module
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value
+    return value
 
 __all__ = [
     "MyrientConfig",
@@ -68,6 +68,3 @@ class MyrientConfig(BaseModel):
         default=None,
         description="Maximum file size to download in bytes (None for no limit)",
     )
-
-    class Config:
-        json_encoders = {Path: str}
@@ -1,9 +1,12 @@
 import asyncio
+import logging
+import os
 import re
-from typing import List, Set, Optional, AsyncGenerator
+from typing import Dict, List, Set, Optional, AsyncGenerator
 from urllib.parse import urljoin, urlparse, unquote
 from pathlib import Path
 import fnmatch
+import time
 from datetime import datetime
 
 import httpx
@@ -11,19 +14,117 @@ from selectolax.parser import HTMLParser
 
 from .models import GameFile, CrawlResult, DownloadStatus, Collection, FileFormat
 from .config import MyrientConfig
+from .database import Database
+
+try:
+    import h2  # noqa: F401  (needed by httpx for HTTP/2)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+# Directories fully crawled within this many seconds are skipped by later
+# crawls that share the database (the archive changes slowly)
+VISITED_TTL = 7 * 24 * 3600
+
+# Listing sizes look like "123.45 MB", "123KB" or "1.2G"
+_SIZE_RE = re.compile(r'(\d+(?:\.\d+)?)\s*([KMGT]?B?)')
+_SIZE_MULTIPLIERS = {
+    'B': 1,
+    'KB': 1024,
+    'MB': 1024**2,
+    'GB': 1024**3,
+    'TB': 1024**4,
+    'K': 1024,
+    'M': 1024**2,
+    'G': 1024**3,
+    'T': 1024**4,
+}
+
+# Region tags such as "(USA, Europe)" or "[En,Fr]". A parenthesized tag anywhere
+# in the name wins over a bracketed one: the first branch is tried at every
+# position before the second is considered.
+_REGION_TAGS = r'USA|Europe|Japan|World|En|Fr|De|Es|It|Pt|Nl|Sv|No|Da|Fi|Ru|Ko|Zh|Rev \d+'
+_REGION_RE = re.compile(
+    rf'.*?\(([^)]*(?:{_REGION_TAGS})[^)]*)\)|.*?\[([^\]]*(?:{_REGION_TAGS})[^\]]*)\]',
+    re.IGNORECASE,
+)
+
+# Common patterns in Myrient paths
+_CONSOLE_MAPPINGS = {
+    "nintendo - game boy": "Game Boy",
+    "nintendo - game boy advance": "Game Boy Advance",
+    "nintendo - game boy color": "Game Boy Color",
+    "nintendo - nintendo ds": "Nintendo DS",
+    "nintendo - nintendo 3ds": "Nintendo 3DS",
+    "nintendo - nintendo entertainment system": "NES",
+    "nintendo - super nintendo entertainment system": "SNES",
+    "nintendo - nintendo 64": "Nintendo 64",
+    "nintendo - nintendo gamecube": "GameCube",
+    "nintendo - wii": "Wii",
+    "nintendo - wii u": "Wii U",
+    "nintendo - switch": "Nintendo Switch",
+    "sony - playstation": "PlayStation",
+    "sony - playstation 2": "PlayStation 2",
+    "sony - playstation 3": "PlayStation 3",
+    "sony - playstation 4": "PlayStation 4",
+    "sony - playstation portable": "PSP",
+    "sony - playstation vita": "PS Vita",
+    "sega - master system": "Master System",
+    "sega - mega drive - genesis": "Genesis/Mega Drive",
+    "sega - game gear": "Game Gear",
+    "sega - saturn": "Saturn",
+    "sega - dreamcast": "Dreamcast",
+    "microsoft - xbox": "Xbox",
+    "microsoft - xbox 360": "Xbox 360",
+    "microsoft - xbox one": "Xbox One",
+    "atari - 2600": "Atari 2600",
+    "atari - 7800": "Atari 7800",
+}
+_CONSOLE_RE = re.compile("|".join(
+    re.escape(key) for key in sorted(_CONSOLE_MAPPINGS, key=len, reverse=True)
+))
+_CONSOLE_VENDOR_RE = re.compile("nintendo|sony|sega|microsoft|atari|game boy|playstation")
 
 
 class MyrientCrawler:
-    def __init__(self, config: MyrientConfig):
+    def __init__(
+        self,
+        config: MyrientConfig,
+        database: Optional[Database] = None,
+        force_refresh: bool = False,
+    ):
         self.config = config
+        self.database = database
+        self.force_refresh = force_refresh
         self.session: Optional[httpx.AsyncClient] = None
         self.visited_urls: Set[str] = set()
+        # Directories whose whole subtree has been crawled (this run or a recent one)
+        self.completed_urls: Set[str] = set()
+        # Completed directories not yet written to the database; see save_visited()
+        self._unsaved_visits: List[str] = []
         
-        # Regex patterns for extracting game info
-        self.region_patterns = [
-            r'\(([^)]*(?:USA|Europe|Japan|World|En|Fr|De|Es|It|Pt|Nl|Sv|No|Da|Fi|Ru|Ko|Zh|Rev \d+)[^)]*)\)',
-            r'\[([^\]]*(?:USA|Europe|Japan|World|En|Fr|De|Es|It|Pt|Nl|Sv|No|Da|Fi|Ru|Ko|Zh|Rev \d+)[^\]]*)\]'
-        ]
+        # Path prefix stripped from listing URLs to get their parent_path
+        self._base_path = urlparse(config.base_url).path.rstrip('/')
+        
+        # Include/exclude globs, each list compiled into one regex
+        self._include_re = self._compile_patterns(config.include_patterns)
+        self._exclude_re = self._compile_patterns(config.exclude_patterns)
+    
+    @staticmethod
+    def _compile_patterns(patterns: List[str]) -> Optional[re.Pattern]:
+        """Compile shell-style patterns into a single alternation (None if empty)
+        
+        Patterns are normcased like fnmatch.fnmatch does (case-insensitive on
+        Windows); names must be normcased the same way before matching.
+        """
+        if not patterns:
+            return None
+        return re.compile("|".join(
+            f"(?:{fnmatch.translate(os.path.normcase(p))})" for p in patterns
+        ))
     
     async def __aenter__(self):
         self.session = httpx.AsyncClient(
@@ -36,8 +137,22 @@ class MyrientCrawler:
             headers={
                 "User-Agent": self.config.user_agent
             },
-            follow_redirects=True
+            follow_redirects=True,
+            # Every listing comes from the same host, so keep connections
+            # alive for the whole crawl and multiplex over HTTP/2 when the
+            # h2 package is installed. Retries cover failed connection setup.
+            transport=httpx.AsyncHTTPTransport(
+                http2=HTTP2_AVAILABLE,
+                limits=httpx.Limits(
+                    max_connections=64,
+                    max_keepalive_connections=32,
+                    keepalive_expiry=30.0,
+                ),
+                retries=2,
+            ),
         )
+        if self.database and not self.force_refresh:
+            self.completed_urls = await self.database.get_visited_urls(int(time.time()) - VISITED_TTL)
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
@@ -45,53 +160,180 @@ class MyrientCrawler:
             await self.session.aclose()
     
     async def crawl_directory(self, url: str, max_depth: int = 3) -> AsyncGenerator[GameFile, None]:
-        """Crawl a directory and yield GameFile objects"""
-        if url in self.visited_urls or max_depth <= 0:
+        """Crawl a directory tree and yield GameFile objects
+        
+        Listings are fetched by up to concurrency.global_max workers at once;
+        results are handled here, one directory at a time, as they arrive.
+        
+        Completed directories are only recorded in the database by
+        save_visited(), which the caller runs after storing the games yielded
+        so far.
+        """
+        if url in self.visited_urls or url in self.completed_urls or max_depth <= 0:
             return
         
         self.visited_urls.add(url)
         
+        pending: asyncio.Queue = asyncio.Queue()
+        worker_count = max(1, self.config.concurrency.global_max)
+        # Bounded so workers don't fetch far ahead of the consumer
+        results: asyncio.Queue = asyncio.Queue(maxsize=worker_count)
+        workers = [
+            asyncio.create_task(self._crawl_worker(pending, results))
+            for _ in range(worker_count)
+        ]
+        
+        parents: Dict[str, str] = {}
+        children_left: Dict[str, int] = {}
+        incomplete: Set[str] = set()
+        outstanding = 1
+        pending.put_nowait((url, max_depth))
+        
         try:
-            response = await self.session.get(url)
-            response.raise_for_status()
-            
-            parser = HTMLParser(response.text)
-            
-            # Extract files and subdirectories
-            files, subdirs = self._parse_directory_listing(url, parser)
+            while outstanding:
+                dir_url, depth, files, subdirs = await results.get()
+                outstanding -= 1
+                
+                if files is None:
+                    # Fetch failed; neither it nor its ancestors are complete
+                    self._finish_directory(dir_url, False, parents, children_left, incomplete)
+                    continue
+                
+                # Yield files that match our criteria
+                for file_info in files:
+                    if self._should_include_file(file_info):
+                        yield file_info
+                
+                # Queue subdirectories
+                children_left[dir_url] = 0
+                for subdir_url in subdirs:
+                    if subdir_url in self.completed_urls:
+                        continue
+                    if subdir_url in self.visited_urls or depth - 1 <= 0:
+                        incomplete.add(dir_url)
+                        continue
+                    self.visited_urls.add(subdir_url)
+                    parents[subdir_url] = dir_url
+                    children_left[dir_url] += 1
+                    outstanding += 1
+                    pending.put_nowait((subdir_url, depth - 1))
+                
+                if not children_left[dir_url]:
+                    self._finish_directory(dir_url, True, parents, children_left, incomplete)
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+    
+    async def _crawl_worker(self, pending: asyncio.Queue, results: asyncio.Queue):
+        """Fetch and parse queued directory listings until cancelled"""
+        while True:
+            url, depth = await pending.get()
+            try:
+                html = await self._fetch_listing(url)
+                
+                # Extract files and subdirectories. Large listings take a while to
+                # parse, so do it in a worker thread rather than on the event loop
+                files, subdirs = await asyncio.to_thread(self._parse_listing_html, url, html)
+            except httpx.HTTPError as e:
+                logger.warning("Error crawling %s: %s", url, e)
+                files, subdirs = None, None
+            except Exception:
+                # Still report the directory, or the crawl would wait for it forever
+                logger.exception("Error parsing %s", url)
+                files, subdirs = None, None
+            await results.put((url, depth, files, subdirs))
+    
+    async def _fetch_listing(self, url: str) -> bytes:
+        """Fetch a listing, retrying connection errors and 5xx responses with backoff"""
+        retries = self.config.retries
+        max_attempts = max(1, retries.max_attempts)
+        
+        for attempt in range(max_attempts):
+            try:
+                # Keep the raw bytes; selectolax decodes them itself, so the
+                # listing is never copied into a Python str
+                async with self.session.stream("GET", url) as response:
+                    response.raise_for_status()
+                    return await response.aread()
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code < 500 or attempt == max_attempts - 1:
+                    raise
+            except httpx.TransportError:
+                if attempt == max_attempts - 1:
+                    raise
             
-            # Yield files that match our criteria
-            for file_info in files:
-                if self._should_include_file(file_info):
-                    yield file_info
+            backoff_time = min(retries.backoff_cap, retries.backoff_base * (2 ** attempt))
+            logger.debug("Retrying %s in %.1fs", url, backoff_time)
+            await asyncio.sleep(backoff_time)
+    
+    async def save_visited(self):
+        """Record the directories completed so far as crawled
+        
+        Call only once every game yielded so far has been stored: recorded
+        directories are skipped by crawls within VISITED_TTL, so games still
+        sitting in an unsaved buffer would never be found again.
+        """
+        urls, self._unsaved_visits = self._unsaved_visits, []
+        if self.database:
+            await self.database.mark_visited(urls, int(time.time()))
+    
+    def _finish_directory(
+        self,
+        url: str,
+        success: bool,
+        parents: Dict[str, str],
+        children_left: Dict[str, int],
+        incomplete: Set[str],
+    ):
+        """Settle a directory whose subtree is done, then any ancestors it completes
+        
+        A directory is only remembered once everything below it was crawled, so
+        an interrupted, failed or depth-limited crawl revisits what it missed.
+        """
+        while True:
+            children_left.pop(url, None)
+            if success and url not in incomplete:
+                self.completed_urls.add(url)
+                self._unsaved_visits.append(url)
+            else:
+                success = False
+            incomplete.discard(url)
             
-            # Recursively crawl subdirectories
-            for subdir_url in subdirs:
-                async for game_file in self.crawl_directory(subdir_url, max_depth - 1):
-                    yield game_file
-                    
-        except Exception as e:
-            print(f"Error crawling {url}: {e}")
+            parent = parents.pop(url, None)
+            if parent is None:
+                return
+            if not success:
+                incomplete.add(parent)
+            children_left[parent] -= 1
+            if children_left[parent]:
+                return
+            url, success = parent, True
     
+    def _parse_listing_html(self, base_url: str, html: bytes) -> tuple[List[GameFile], List[str]]:
+        """Parse a directory listing page from its raw HTML bytes"""
+        return self._parse_directory_listing(base_url, HTMLParser(html))
+
     def _parse_directory_listing(self, base_url: str, parser: HTMLParser) -> tuple[List[GameFile], List[str]]:
         """Parse HTML directory listing to extract files and subdirectories"""
         files = []
         subdirs = []
         
-        # Look for table rows or file listings
-        # Myrient uses a table format for file listings
-        rows = parser.css("tr")
+        # Every file in a listing shares its directory's metadata
+        parent_path = self._extract_parent_path(base_url)
+        console = self._extract_console(base_url)
+        collection = self._extract_collection(parent_path)
+        update_frequency = self._get_collection_update_frequency(parent_path)
         
-        for row in rows:
-            cells = row.css("td")
-            if len(cells) < 2:
+        # Myrient uses a table format for file listings, with the link in
+        # each row's first cell. Select those cells in one query and walk to
+        # the sibling cells from there instead of querying every row.
+        for first_cell in parser.css("tr > td:first-child"):
+            link_elem = first_cell.css_first("a")
+            if link_elem is None:
                 continue
-            
-            # First cell usually contains the link
-            link_cell = cells[0]
-            link_elem = link_cell.css_first("a")
-            
-            if not link_elem:
+            cells = [node for node in first_cell.parent.iter() if node.tag == "td"]
+            if len(cells) < 2:
                 continue
             
             href = link_elem.attributes.get("href", "")
@@ -108,26 +350,26 @@ class MyrientCrawler:
                 # Extract file size (usually in second or third cell)
                 size = None
                 for cell in cells[1:]:
-                    size_text = cell.text().strip()
+                    size_text = cell.text(strip=True)
                     if size_text and size_text != "-":
                         size = self._parse_file_size(size_text)
                         break
                 
                 # Extract metadata
-                parent_path = self._extract_parent_path(base_url)
                 file_ext = Path(filename).suffix.lstrip('.').lower()
 
-                # Create GameFile object with enhanced metadata
-                game_file = GameFile(
+                # Create GameFile object with enhanced metadata. Every value is
+                # built here with the right type, so validation is skipped
+                game_file = GameFile.model_construct(
                     url=full_url,
                     name=filename,
                     size=size,
                     parent_path=parent_path,
                     file_type=file_ext,
-                    console=self._extract_console(base_url),
+                    console=console,
                     region=self._extract_region(filename),
-                    collection=self._extract_collection(parent_path),
-                    collection_update_frequency=self._get_collection_update_frequency(parent_path),
+                    collection=collection,
+                    collection_update_frequency=update_frequency,
                     file_format=self._determine_file_format(file_ext),
                     requires_conversion=self._requires_conversion(file_ext)
                 )
@@ -138,17 +380,16 @@ class MyrientCrawler:
     
     def _should_include_file(self, game_file: GameFile) -> bool:
         """Check if file should be included based on patterns"""
-        filename = game_file.name
+        # Normcased to match the compiled patterns (a no-op on POSIX)
+        filename = os.path.normcase(game_file.name)
         
         # Check include patterns
-        if self.config.include_patterns:
-            if not any(fnmatch.fnmatch(filename, pattern) for pattern in self.config.include_patterns):
-                return False
+        if self._include_re and not self._include_re.match(filename):
+            return False
         
         # Check exclude patterns
-        if self.config.exclude_patterns:
-            if any(fnmatch.fnmatch(filename, pattern) for pattern in self.config.exclude_patterns):
-                return False
+        if self._exclude_re and self._exclude_re.match(filename):
+            return False
         
         # Check file size limit
         if self.config.max_download_size and game_file.size:
@@ -161,24 +402,12 @@ class MyrientCrawler:
         """Parse file size string to bytes"""
         size_text = size_text.strip().replace(",", "")
         
-        # Handle different size formats
-        multipliers = {
-            'B': 1,
-            'KB': 1024,
-            'MB': 1024**2,
-            'GB': 1024**3,
-            'TB': 1024**4,
-            'K': 1024,
-            'M': 1024**2,
-            'G': 1024**3,
-        }
-        
         # Try to match pattern like "123.45 MB" or "123KB"
-        match = re.match(r'(\d+(?:\.\d+)?)\s*([KMGT]?B?)', size_text.upper())
+        match = _SIZE_RE.match(size_text.upper())
         if match:
             size_value = float(match.group(1))
             unit = match.group(2) or 'B'
-            return int(size_value * multipliers.get(unit, 1))
+            return int(size_value * _SIZE_MULTIPLIERS.get(unit, 1))
         
         # Try to parse as plain number
         try:
@@ -192,9 +421,8 @@ class MyrientCrawler:
         path = parsed.path.rstrip('/')
         
         # Remove base path
-        base_path = urlparse(self.config.base_url).path.rstrip('/')
-        if path.startswith(base_path):
-            path = path[len(base_path):].lstrip('/')
+        if path.startswith(self._base_path):
+            path = path[len(self._base_path):].lstrip('/')
         
         return path
     
@@ -202,58 +430,24 @@ class MyrientCrawler:
         """Extract console name from URL path"""
         parent_path = self._extract_parent_path(url)
         
-        # Common patterns in Myrient paths
-        console_mappings = {
-            "nintendo - game boy": "Game Boy",
-            "nintendo - game boy advance": "Game Boy Advance",
-            "nintendo - game boy color": "Game Boy Color",
-            "nintendo - nintendo ds": "Nintendo DS",
-            "nintendo - nintendo 3ds": "Nintendo 3DS",
-            "nintendo - nintendo entertainment system": "NES",
-            "nintendo - super nintendo entertainment system": "SNES",
-            "nintendo - nintendo 64": "Nintendo 64",
-            "nintendo - nintendo gamecube": "GameCube",
-            "nintendo - wii": "Wii",
-            "nintendo - wii u": "Wii U",
-            "nintendo - switch": "Nintendo Switch",
-            "sony - playstation": "PlayStation",
-            "sony - playstation 2": "PlayStation 2",
-            "sony - playstation 3": "PlayStation 3",
-            "sony - playstation 4": "PlayStation 4",
-            "sony - playstation portable": "PSP",
-            "sony - playstation vita": "PS Vita",
-            "sega - master system": "Master System",
-            "sega - mega drive - genesis": "Genesis/Mega Drive",
-            "sega - game gear": "Game Gear",
-            "sega - saturn": "Saturn",
-            "sega - dreamcast": "Dreamcast",
-            "microsoft - xbox": "Xbox",
-            "microsoft - xbox 360": "Xbox 360",
-            "microsoft - xbox one": "Xbox One",
-            "atari - 2600": "Atari 2600",
-            "atari - 7800": "Atari 7800",
-        }
-        
-        parent_lower = parent_path.lower()
-        for key, value in console_mappings.items():
-            if key in parent_lower:
-                return value
+        # Longest key first, so e.g. "game boy advance" isn't read as "game boy"
+        match = _CONSOLE_RE.search(parent_path.lower())
+        if match:
+            return _CONSOLE_MAPPINGS[match.group(0)]
         
         # Try to extract from path segments
         segments = parent_path.split('/')
         for segment in segments:
-            if any(console_name in segment.lower() for console_name in 
-                   ["nintendo", "sony", "sega", "microsoft", "atari", "game boy", "playstation"]):
+            if _CONSOLE_VENDOR_RE.search(segment.lower()):
                 return segment.replace(' - ', ' ').title()
         
         return None
     
     def _extract_region(self, filename: str) -> Optional[str]:
         """Extract region information from filename"""
-        for pattern in self.region_patterns:
-            match = re.search(pattern, filename, re.IGNORECASE)
-            if match:
-                return match.group(1)
+        match = _REGION_RE.match(filename)
+        if match:
+            return match.group(1) or match.group(2)
         return None
 
     def _extract_collection(self, parent_path: str) -> Collection:
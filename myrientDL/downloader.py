@@ -1,6 +1,7 @@
 import asyncio
 import aiofiles
 import hashlib
+import logging
 import time
 from typing import Optional, Dict, Callable, Any
 from pathlib import Path
@@ -14,6 +15,18 @@ from .models import GameFile, DownloadStatus, DownloadWarning
 from .config import MyrientConfig
 from .database import Database
 
+logger = logging.getLogger(__name__)
+
+# Seconds between database writes of download progress. Progress of every
+# active download is collected in between and written in one transaction.
+PROGRESS_FLUSH_INTERVAL = 1.0
+
+# Seconds between background WAL checkpoints while downloads run. Progress
+# commits are batched and use synchronous=NORMAL, so a power loss can lose
+# the last few seconds of progress (never a completed status); downloads
+# resume from the bytes on disk either way.
+CHECKPOINT_INTERVAL = 60.0
+
 
 class TokenBucket:
     """Rate limiter using token bucket algorithm"""
@@ -73,6 +86,10 @@ class DownloadManager:
 
         # HTTP client
         self.session: Optional[httpx.AsyncClient] = None
+
+        # Games with progress not yet written to the database, by URL
+        self._pending_progress: Dict[str, GameFile] = {}
+        self._flush_task: Optional[asyncio.Task] = None
     
     async def __aenter__(self):
         self.session = httpx.AsyncClient(
@@ -88,12 +105,52 @@ class DownloadManager:
             follow_redirects=True
         )
         self.download_stats["start_time"] = time.time()
+        self._flush_task = asyncio.create_task(self._flush_progress_loop())
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if self._flush_task:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self._flush_progress()
         if self.session:
             await self.session.aclose()
     
+    async def _flush_progress_loop(self):
+        """Write collected progress every PROGRESS_FLUSH_INTERVAL seconds
+        and checkpoint the WAL every CHECKPOINT_INTERVAL seconds"""
+        last_checkpoint = time.monotonic()
+        while True:
+            await asyncio.sleep(PROGRESS_FLUSH_INTERVAL)
+            try:
+                await self._flush_progress()
+            except Exception:
+                logger.exception("Failed to save download progress")
+
+            if time.monotonic() - last_checkpoint >= CHECKPOINT_INTERVAL:
+                last_checkpoint = time.monotonic()
+                try:
+                    await self.database.checkpoint()
+                except Exception:
+                    logger.exception("Failed to checkpoint the database")
+    
+    async def _flush_progress(self):
+        """Write collected progress to the database"""
+        if not self._pending_progress:
+            return
+        game_files = list(self._pending_progress.values())
+        self._pending_progress.clear()
+        await self.database.update_download_progress(game_files)
+    
+    async def _save_game_file(self, game_file: GameFile):
+        """Write a status change now; it includes any progress still pending"""
+        self._pending_progress.pop(game_file.url, None)
+        await self.database.update_download_state(game_file)
+    
     def add_progress_callback(self, callback: Callable[[GameFile, int, int], None]):
         """Add a progress callback function"""
         self.progress_callbacks.append(callback)
@@ -139,7 +196,7 @@ class DownloadManager:
                 # Update status to downloading
                 game_file.status = DownloadStatus.DOWNLOADING
                 game_file.download_attempts = attempt + 1
-                await self.database.update_game_file(game_file)
+                await self._save_game_file(game_file)
                 
                 self.download_stats["active_downloads"] += 1
                 
@@ -155,7 +212,7 @@ class DownloadManager:
                     for callback in self.progress_callbacks:
                         callback(game_file, game_file.bytes_downloaded, game_file.size or game_file.bytes_downloaded)
                     
-                    await self.database.update_game_file(game_file)
+                    await self._save_game_file(game_file)
                     self.download_stats["completed_downloads"] += 1
                     return True
                 
@@ -173,17 +230,27 @@ class DownloadManager:
                 else:
                     # Final failure
                     game_file.status = DownloadStatus.FAILED
-                    await self.database.update_game_file(game_file)
+                    await self._save_game_file(game_file)
                     self.download_stats["failed_downloads"] += 1
                     self.download_stats["active_downloads"] -= 1
                     return False
         
         # All attempts failed
         game_file.status = DownloadStatus.FAILED
-        await self.database.update_game_file(game_file)
+        await self._save_game_file(game_file)
         self.download_stats["failed_downloads"] += 1
         return False
     
+    @staticmethod
+    def _hash_existing(hasher: Any, path: Path):
+        """Feed an existing file into a running hash (blocking; run in a thread)"""
+        with open(path, "rb") as f:
+            while True:
+                chunk = f.read(1024 * 1024)
+                if not chunk:
+                    break
+                hasher.update(chunk)
+
     async def _download_file_impl(self, game_file: GameFile) -> bool:
         """Actual file download implementation"""
         if not game_file.local_path:
@@ -206,14 +273,10 @@ class DownloadManager:
         if temp_path.exists() and self.config.resume_downloads:
             start_pos = temp_path.stat().st_size
             
-            # Re-hash existing content to continue checksum verification
+            # Re-hash existing content to continue checksum verification. This can
+            # be gigabytes, so it runs in a worker thread (hashlib releases the GIL)
             if start_pos > 0:
-                async with aiofiles.open(temp_path, "rb") as f:
-                    while True:
-                        chunk = await f.read(8192)
-                        if not chunk:
-                            break
-                        hasher.update(chunk)
+                await asyncio.to_thread(self._hash_existing, hasher, temp_path)
         
         # Prepare headers for resumable download
         headers = {}
@@ -284,8 +347,8 @@ class DownloadManager:
                             for callback in self.progress_callbacks:
                                 callback(game_file, game_file.bytes_downloaded, game_file.size or 0)
 
-                            # Update database
-                            await self.database.update_game_file(game_file)
+                            # Saved with the next progress flush
+                            self._pending_progress[game_file.url] = game_file
                             last_progress_update = current_time
                 
                 # Verify download completion
@@ -57,6 +57,7 @@ class FileFormat(str, Enum):
 
 class GameFile(BaseModel):
     """Represents a game file discovered during crawling"""
+    id: Optional[int] = None  # database row id, None until persisted
     url: str
     name: str
     size: Optional[int] = None
@@ -1,4 +1,5 @@
-from typing import List, Optional, Dict, Any, Tuple
+from typing import List, Optional, Dict, Any, Tuple, Union
+import heapq
 import re
 from fuzzywuzzy import fuzz, process
 from dataclasses import dataclass
@@ -7,6 +8,10 @@ from .models import GameFile, Collection
 from .database import Database
 
 
+# Separators and punctuation replaced by spaces when normalizing text
+_SEPARATORS = re.compile(r'[_\-\.\(\)\[\]!]')
+
+
 @dataclass
 class SearchResult:
     game_file: GameFile
@@ -66,7 +71,7 @@ class GameSearch:
         self,
         query: str,
         console: Optional[str] = None,
-        collection: Optional[Collection] = None,
+        collection: Optional[Union[Collection, str]] = None,
         limit: int = 50,
         min_score: int = 60
     ) -> List[SearchResult]:
@@ -82,23 +87,20 @@ class GameSearch:
         """
         results = []
 
-        # Get all games (filtered by console if specified)
-        all_games = await self.database.get_game_files(console=console, limit=None)
-
-        # Filter by collection if specified
-        if collection:
-            all_games = [g for g in all_games if g.collection == collection]
+        # Get candidate games (console/collection filters are applied in SQL)
+        all_games = await self.database.get_game_files(console=console, collection=collection, limit=None)
 
         if not all_games:
             return results
 
-        # Normalize query
+        # Normalize query, and each game name once for all name strategies
         normalized_query = self._normalize_text(query)
+        normalized_names = [self._normalize_text(game.name) for game in all_games]
 
         # Try different search strategies
-        results.extend(await self._exact_search(normalized_query, all_games))
-        results.extend(await self._fuzzy_search(normalized_query, all_games, min_score))
-        results.extend(await self._partial_search(normalized_query, all_games, min_score))
+        results.extend(await self._exact_search(normalized_query, all_games, normalized_names))
+        results.extend(await self._fuzzy_search(normalized_query, all_games, normalized_names, min_score))
+        results.extend(await self._partial_search(normalized_query, all_games, normalized_names, min_score))
         results.extend(await self._console_search(query, all_games))
         results.extend(await self._region_search(query, all_games))
         results.extend(await self._collection_search(query, all_games))
@@ -114,13 +116,11 @@ class GameSearch:
         sorted_results = sorted(unique_results.values(), key=lambda x: x.score, reverse=True)
         return sorted_results[:limit]
     
-    async def _exact_search(self, query: str, games: List[GameFile]) -> List[SearchResult]:
+    async def _exact_search(self, query: str, games: List[GameFile], names: List[str]) -> List[SearchResult]:
         """Find exact matches"""
         results = []
         
-        for game in games:
-            normalized_name = self._normalize_text(game.name)
-            
+        for game, normalized_name in zip(games, names):
             if query == normalized_name:
                 results.append(SearchResult(
                     game_file=game,
@@ -131,12 +131,14 @@ class GameSearch:
         
         return results
     
-    async def _fuzzy_search(self, query: str, games: List[GameFile], min_score: int) -> List[SearchResult]:
+    async def _fuzzy_search(
+        self, query: str, games: List[GameFile], names: List[str], min_score: int
+    ) -> List[SearchResult]:
         """Perform fuzzy string matching on game names"""
         results = []
         
         # Create list of (normalized_name, game) tuples
-        game_names = [(self._normalize_text(game.name), game) for game in games]
+        game_names = list(zip(names, games))
         
         # Use fuzzywuzzy to find best matches
         matches = process.extract(
@@ -161,13 +163,13 @@ class GameSearch:
         
         return results
     
-    async def _partial_search(self, query: str, games: List[GameFile], min_score: int) -> List[SearchResult]:
+    async def _partial_search(
+        self, query: str, games: List[GameFile], names: List[str], min_score: int
+    ) -> List[SearchResult]:
         """Find partial matches using substring search"""
         results = []
         
-        for game in games:
-            normalized_name = self._normalize_text(game.name)
-            
+        for game, normalized_name in zip(games, names):
             if query in normalized_name:
                 # Calculate score based on how much of the name matches
                 score = min(95, int((len(query) / len(normalized_name)) * 100))
@@ -270,11 +272,11 @@ class GameSearch:
         if not text:
             return ""
         
-        # Convert to lowercase
-        text = text.lower()
+        # Convert to lowercase (casefold also folds non-ASCII case variants)
+        text = text.casefold()
         
         # Remove common separators and punctuation
-        text = re.sub(r'[_\-\.\(\)\[\]!]', ' ', text)
+        text = _SEPARATORS.sub(' ', text)
         
         # Remove extra whitespace
         text = ' '.join(text.split())
@@ -294,12 +296,10 @@ class GameSearch:
         
         suggestions = set()
         
-        # Get games from database
-        games = await self.database.get_game_files(limit=1000)
-        
         normalized_query = self._normalize_text(partial_query)
         
-        for game in games:
+        # Stream games from database
+        async for game in self.database.stream_game_files(limit=1000):
             normalized_name = self._normalize_text(game.name)
             
             # Add game names that start with the query
@@ -316,7 +316,7 @@ class GameSearch:
     
     async def get_popular_games(self, console: Optional[str] = None, limit: int = 20) -> List[GameFile]:
         """Get popular/recommended games (simplified heuristic)"""
-        games = await self.database.get_game_files(console=console, limit=None)
+        games = self.database.stream_game_files(console=console, limit=None)
         
         # Simple popularity heuristic based on common keywords
         popular_keywords = [
@@ -325,8 +325,11 @@ class GameSearch:
             "ultimate", "championship", "deluxe", "complete", "goty"
         ]
         
+        # Keep only the best `limit` games while streaming the catalog; ties
+        # keep catalog order (the index breaks them)
         scored_games = []
-        for game in games:
+        index = 0
+        async for game in games:
             score = 0
             name_lower = game.name.lower()
             
@@ -343,8 +346,13 @@ class GameSearch:
             if game.region and any(region in game.region.lower() for region in ["usa", "world", "en"]):
                 score += 15
             
-            scored_games.append((score, game))
+            entry = (score, -index, game)
+            index += 1
+            if len(scored_games) < limit:
+                heapq.heappush(scored_games, entry)
+            elif scored_games and entry[:2] > scored_games[0][:2]:
+                heapq.heapreplace(scored_games, entry)
         
         # Sort by score and return top games
-        scored_games.sort(key=lambda x: x[0], reverse=True)
-        return [game for _, game in scored_games[:limit]]
\ No newline at end of file
+        scored_games.sort(key=lambda x: x[:2], reverse=True)
+        return [game for _, _, game in scored_games]
\ No newline at end of file